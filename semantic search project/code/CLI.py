@@ -2,11 +2,26 @@ import os
 import json
 import logging
 import sys
-from typing import Any, Dict, List, Optional
-from functools import lru_cache
-from sentence_transformers import SentenceTransformer
-import typesense
+import time
+import heapq
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from dotenv import load_dotenv
+from embedserver import EmbeddingClient
+from suggest import PrefixIndex, load_prefix_index
+from sharding import get_shard_key, load_shards, shards_for_categories
+from hedging import LatencyTracker, ResultCache, ThreadPerCallExecutor, hedged_call, remaining
+
+# Insert the parent directory into sys.path so that config.py can be imported.
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+import config
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 
 load_dotenv()
@@ -19,17 +34,31 @@ logging.basicConfig(
 API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("API_KEY is not set in the environment variables.")
-TYPESENSE_HOST = os.getenv("TYPESENSE_HOST", "localhost")
-TYPESENSE_PORT = os.getenv("TYPESENSE_PORT", "8108")
-TYPESENSE_PROTOCOL = os.getenv("TYPESENSE_PROTOCOL", "http")
 COLLECTION_NAME = os.getenv("TYPESENSE_COLLECTION", "products")
 MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET")
+# Per-query time budget covering encoding and every Typesense request
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "2"))
+# A shard request slower than this percentile of its recent latencies is duplicated to another replica
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# How long a complete result may be served in place of a search that missed its deadline
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
 
+# Query prefixes accepted by the CLI filter syntax, mapped to the facet fields in the schema
+FILTER_FIELDS = {"category": "Category"}
 
-# Cache the SentenceTransformer model so it is loaded only once per process
+
+# Cache the SentenceTransformer model so it is loaded only once per process.
+# When an embedding server is configured, return a client for it instead so
+# every worker on the host shares the server's single copy of the model.
 @lru_cache(maxsize=1)
-def get_model() -> SentenceTransformer:
+def get_model() -> Union["SentenceTransformer", EmbeddingClient]:
+    if EMBEDDING_SOCKET:
+        logging.info(f"Using embedding server at {EMBEDDING_SOCKET}.")
+        return EmbeddingClient(EMBEDDING_SOCKET)
     try:
+        # Imported here so workers backed by the embedding server never load torch.
+        from sentence_transformers import SentenceTransformer
         model_instance = SentenceTransformer(MODEL_NAME)
         logging.info("SentenceTransformer model loaded successfully.")
         return model_instance
@@ -38,28 +67,214 @@ def get_model() -> SentenceTransformer:
         raise e
 
 
-# Initialize the Typesense client
+# Load the title prefix index built by indximport.py once per process
+@lru_cache(maxsize=1)
+def get_suggestion_index() -> Optional[PrefixIndex]:
+    try:
+        index = load_prefix_index(config.SUGGESTIONS_FILE)
+        logging.info("Title suggestions index loaded successfully.")
+        return index
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        logging.warning("Title suggestions index is unavailable. Run indximport.py to build it.")
+        return None
+
+
+# Load the shard collections (TYPESENSE_SHARDS, or a single shard by default) and open one
+# HTTP session per replica node. Searches POST to multi_search directly rather than through
+# typesense.Client, whose timeout is fixed when the client is built, so every request can be
+# given the time left in its own query's deadline. Retries are left to the hedging logic.
 try:
-    client = typesense.Client({
-        'nodes': [{
-            'host': TYPESENSE_HOST,
-            'port': TYPESENSE_PORT,
-            'protocol': TYPESENSE_PROTOCOL
-        }],
-        'api_key': API_KEY,
-        'connection_timeout_seconds': 5
-    })
-    logging.info("Typesense client initialized successfully.")
+    shards = load_shards(COLLECTION_NAME)
+    shard_key = get_shard_key()
+    shard_replicas = [
+        [(f"{node['protocol']}://{node['host']}:{node['port']}/multi_search", requests.Session())
+         for node in shard.nodes]
+        for shard in shards
+    ]
+    logging.info(f"Typesense clients initialized successfully for {len(shards)} shard(s).")
 except Exception as e:
     logging.error("Error initializing Typesense client. Please check configuration.")
     sys.exit(1)
 
+# Recent request latencies of each shard, used to decide when to send a hedged request
+shard_latencies = [LatencyTracker(percentile=HEDGE_PERCENTILE) for _ in shards]
+# Last complete results per query, served when a later run of the same query misses its deadline
+result_cache = ResultCache(max_age=RESULT_CACHE_TTL_SECONDS)
+
+# Worker threads used to query every shard concurrently. Requests to replicas each get
+# their own thread, so a hedged request is never queued behind one still stuck on a slow node.
+search_executor = ThreadPoolExecutor(max_workers=len(shards))
+replica_executor = ThreadPerCallExecutor()
+
+
+def search_shard(shard_index: int, search_parameters: Dict[str, Any],
+                 deadline: float) -> Optional[Dict[str, Any]]:
+    """
+    Run the search against one shard's collection and return its result. If the first replica
+    is slower than the shard's usual latency percentile, the same request is sent to the next
+    replica and the first answer wins.
+    Raises TimeoutError if no replica answered before the deadline, or the replicas' error
+    (e.g. a missing collection or a refused connection) if they all failed.
+    """
+    shard = shards[shard_index]
+    latency = shard_latencies[shard_index]
+    # Multi-search request body (for efficiency and future scalability)
+    multi_search_body = {
+        "searches": [{**search_parameters, "collection": shard.collection}]
+    }
+
+    def query_replica(url: str, session: requests.Session) -> Optional[Dict[str, Any]]:
+        start = time.monotonic()
+        # The HTTP timeout is whatever is left of this query's budget, so an attempt that
+        # loses its race or hits a slow node gives up by the deadline too.
+        try:
+            response = session.post(
+                url,
+                json=multi_search_body,
+                headers={"X-TYPESENSE-API-KEY": API_KEY},
+                timeout=max(remaining(deadline), 0.001)
+            )
+        except requests.exceptions.Timeout as error:
+            raise TimeoutError(f"No answer from {url} before the search deadline.") from error
+        response.raise_for_status()
+        results = response.json()
+        latency.record(time.monotonic() - start)
+        result = results['results'][0] if results.get('results') else None
+        if result is not None and 'error' in result:
+            raise RuntimeError(result['error'])
+        return result
+
+    try:
+        attempts = [partial(query_replica, url, session) for url, session in shard_replicas[shard_index]]
+        return hedged_call(replica_executor, attempts, latency.threshold(), deadline)
+    except TimeoutError:
+        logging.warning(f"Shard '{shard.collection}' did not answer before the search deadline.")
+        raise
+    except Exception as error:
+        logging.error(f"Search failed on shard '{shard.collection}'.")
+        logging.debug(f"Detailed error: {error}", exc_info=True)
+        raise
+
+
+def merge_shard_results(shard_results: List[Dict[str, Any]], k: int) -> Dict[str, Any]:
+    """
+    Combine per-shard results into one. Each shard returns its hits ordered by
+    vector_distance, so a k-way merge yields the global top k without a full sort.
+    Products stored on several shards (see sharding.shards_for_product) are kept once.
+    'found' is the sum of the shards' counts, so with TYPESENSE_SHARD_KEY=category a product
+    stored on several of the queried shards is counted once per shard: it is an upper bound
+    on the number of matching products, exact only with the 'hash' key or a single shard.
+    """
+    merged_hits = heapq.merge(
+        *(result.get('hits', []) for result in shard_results),
+        key=lambda hit: hit.get('vector_distance', float('inf'))
+    )
+    seen_ids = set()
+    unique_hits = []
+    for hit in merged_hits:
+        document_id = hit.get('document', {}).get('id')
+        if document_id is not None:
+            if document_id in seen_ids:
+                continue
+            seen_ids.add(document_id)
+        unique_hits.append(hit)
+        if len(unique_hits) >= k:
+            break
+    return {
+        "hits": unique_hits,
+        # Upper bound with the 'category' shard key; see the docstring
+        "found": sum(result.get('found', 0) for result in shard_results),
+        "search_time_ms": max((result.get('search_time_ms', 0) for result in shard_results), default=0)
+    }
+
+
+def degraded_results(cache_key: Tuple[Any, ...], shard_results: List[Dict[str, Any]],
+                     num_shards: int, k: int, timed_out: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Fallback for a search that did not hear from every shard. If the missing shards ran out of
+    time, prefer the last complete result for the same query, otherwise merge whatever shards did
+    answer. If a shard failed outright (timed_out=False), only the answered shards are used, since
+    a cached result would hide the failure. The result's 'degraded' key says which was returned:
+    'cached' or 'partial' after a deadline, 'incomplete' after a shard error.
+    """
+    if timed_out:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logging.warning("Returning cached results because the search did not complete in time.")
+            return {**cached, "degraded": "cached"}
+    if shard_results:
+        logging.warning(f"Returning partial results from {len(shard_results)} of {num_shards} shard(s).")
+        return {**merge_shard_results(shard_results, k), "degraded": "partial" if timed_out else "incomplete"}
+    return None
+
 
-def perform_search(query_text: str, k: int = 10) -> Optional[Dict[str, Any]]:
+def degraded_note(results: Dict[str, Any]) -> Optional[str]:
+    """
+    Explain to the user why the results are not a complete, fresh search, if they are not.
+    """
+    degraded = results.get('degraded')
+    if degraded == "incomplete":
+        return "Note: some shards could not be searched; showing results from the others."
+    if degraded:
+        return f"Note: the search ran out of time; showing {degraded} results."
+    return None
+
+
+def parse_query(raw_query: str) -> Tuple[str, Dict[str, List[str]]]:
+    """
+    Split the user's input into the free-text query and the facet filters.
+    Tokens of the form field:value (e.g. category:cat-159 or category:cat-159,cat-75)
+    become exact-match filters on the corresponding facet field; everything else is searched.
+    """
+    terms = []
+    filters: Dict[str, List[str]] = {}
+    for token in raw_query.split():
+        field, sep, value = token.partition(":")
+        facet_field = FILTER_FIELDS.get(field.lower())
+        values = [v for v in value.split(",") if v]
+        # Tokens without any value (e.g. "category:,") are searched as text rather than sent as an empty filter
+        if not sep or facet_field is None or not values:
+            terms.append(token)
+            continue
+        filters.setdefault(facet_field, []).extend(values)
+    return " ".join(terms), filters
+
+
+def build_filter_by(filters: Dict[str, List[str]]) -> Optional[str]:
+    """
+    Build the Typesense filter_by expression matching any of the given values of each facet field.
+    """
+    # Backticks keep values containing commas, dashes or spaces from being parsed as syntax
+    expressions = [
+        f"{field}:=[{','.join(f'`{value}`' for value in values)}]"
+        for field, values in filters.items() if values
+    ]
+    return " && ".join(expressions) if expressions else None
+
+
+def target_shards(filters: Dict[str, List[str]]) -> List[int]:
+    """
+    Return the shards that can hold matching documents: with TYPESENSE_SHARD_KEY=category,
+    a category filter only needs the shards of those categories; otherwise every shard.
+    """
+    if shard_key == "category" and filters.get("Category"):
+        return shards_for_categories(filters["Category"], len(shards))
+    return list(range(len(shards)))
+
+
+def perform_search(query_text: str, k: int = 10, filters: Optional[Dict[str, List[str]]] = None,
+                   timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     Convert a search query into an embedding vector, build the vector query,
-    and perform a multi_search in the Typesense collection.
+    and perform a multi_search on the shard collections concurrently, merging the hits.
+    filters maps facet fields to accepted values (see parse_query); only matching documents
+    are scored against the query vector, and only on the shards that can hold them.
+    The whole search must finish within timeout seconds (SEARCH_TIMEOUT_SECONDS by default);
+    past that, cached or partial results are returned (see degraded_results).
     """
+    filters = filters or {}
+    filter_by = build_filter_by(filters)
+    cache_key = (query_text.strip(), k, filter_by)
     try:
         # Validate the query
         if not query_text.strip():
@@ -69,30 +284,67 @@ def perform_search(query_text: str, k: int = 10) -> Optional[Dict[str, Any]]:
         # Get the cached model
         model = get_model()
 
-        # Convert the query into an embedding vector using the model
-        query_embedding = model.encode(query_text).tolist()
+        # Start the clock once the model is available, so a one-off cold load does not count against the first query
+        deadline = time.monotonic() + (timeout if timeout is not None else SEARCH_TIMEOUT_SECONDS)
+
+        # Convert the query into an embedding vector using the model.
+        # The embedding server is given the remaining budget for the whole exchange (it raises
+        # TimeoutError once that is spent); a local model cannot be interrupted, so the deadline
+        # is checked once it returns.
+        try:
+            if isinstance(model, EmbeddingClient):
+                query_embedding = model.encode(query_text, timeout=max(remaining(deadline), 0.001)).tolist()
+            else:
+                query_embedding = model.encode(query_text).tolist()
+        except TimeoutError:
+            query_embedding = None
+        if query_embedding is None or remaining(deadline) <= 0:
+            logging.warning("Search deadline expired while encoding the query.")
+            return degraded_results(cache_key, [], len(shards), k)
+
         # Convert the embedding vector into a string to match the required format for Typesense
         vector_values = ",".join(map(str, query_embedding))
         vector_query_str = f"embedding:([{vector_values}], k:{k})"
         logging.debug(f"Vector query: {vector_query_str}")
 
-        # Build search parameters for multi_search
+        # Build search parameters for multi_search; the collection is set per shard
         search_parameters = {
-            "collection": COLLECTION_NAME,  # The collection in Typesense where we are performing the search
             "q": "*",  # Search across all documents
             "query_by": "combined_text",  # Field to search (combined text of title and description)
-            "vector_query": vector_query_str  # The vector query string for the embedding
+            "vector_query": vector_query_str,  # The vector query string for the embedding
+            "per_page": k  # Every shard must return its own top k for the merge
         }
+        if filter_by:
+            # Pre-filter on facet fields so the vector search only scores matching documents
+            search_parameters["filter_by"] = filter_by
 
-        # Multi-search request body (for efficiency and future scalability)
-        multi_search_body = {
-            "searches": [search_parameters]  # We wrap the search parameters in the searches array
-        }
+        # Fan out to the shards at once so latency tracks the slowest shard, not the sum.
+        # Every shard search returns by the deadline, answered or not.
+        shard_indexes = target_shards(filters)
+        futures = [
+            search_executor.submit(search_shard, shard_index, search_parameters, deadline)
+            for shard_index in shard_indexes
+        ]
+        shard_results = []
+        failed = False
+        for future in futures:
+            try:
+                result = future.result()
+            except TimeoutError:
+                continue
+            except Exception:
+                failed = True
+                continue
+            if result is None:
+                failed = True
+            else:
+                shard_results.append(result)
+        if len(shard_results) < len(shard_indexes):
+            return degraded_results(cache_key, shard_results, len(shard_indexes), k, timed_out=not failed)
 
-        # If the 'results' key exists in the response, return the first search result.
-        # Otherwise, return None indicating that no results were found.
-        results = client.multi_search.perform(multi_search_body)
-        return results['results'][0] if results.get('results') else None
+        results = merge_shard_results(shard_results, k)
+        result_cache.put(cache_key, results)
+        return results
 
     except Exception as error:
         logging.error("Error during search operation.")
@@ -103,17 +355,13 @@ def perform_search(query_text: str, k: int = 10) -> Optional[Dict[str, Any]]:
 
 def filter_results(matching_results: List[Dict[str, Any]]) -> None:
     """
-    Sort search results by vector_distance and display formatted information
+    Display formatted information for search results, which perform_search
+    already returns merged in vector_distance order
 
     """
-    # Sort results by vector_distance for relevance order
-    sorted_results = sorted(
-        matching_results,
-        key=lambda result: result.get('vector_distance', float('inf'))
-    )
     #Format Display results
     print("\nSearch Results:")
-    for result in sorted_results:
+    for result in matching_results:
         doc = result.get('document', {})
         # Only show fields useful for the user
         filtered_doc = {key: value for key, value in doc.items() if key in ['Title', 'Description', 'URL']}
@@ -121,8 +369,30 @@ def filter_results(matching_results: List[Dict[str, Any]]) -> None:
         print("-" * 40)
 
 
+def show_suggestions(prefix: str, limit: int = 10) -> None:
+    """
+    Print product titles matching the typed prefix, served from the local index
+    without encoding the query or calling Typesense.
+    """
+    index = get_suggestion_index()
+    if index is None:
+        print("Suggestions are not available.")
+        return
+    start = time.perf_counter()
+    suggestions = index.suggest(prefix, limit)
+    logging.debug(f"Suggestions for '{prefix}' served in {(time.perf_counter() - start) * 1000:.3f} ms.")
+    if not suggestions:
+        print("No suggestions found.")
+        return
+    print("\nSuggestions:")
+    for title in suggestions:
+        print(f"  - {title}")
+
+
 def main() -> None:
     print("Welcome to Jooyeshgar!")
+    print("Tip: narrow a search with filters, e.g. 'printer category:cat-159' or 'category:cat-159,cat-75 printer'.")
+    print("Tip: start with '?' to see matching product titles, e.g. '?پرین'.")
     while True:
         query = input("What are you looking for? (type 'exit' to quit): ").strip()
         # handling user input; prompt again if input is empty
@@ -134,8 +404,20 @@ def main() -> None:
             print("Exiting the search system. Goodbye!")
             break
 
-        results = perform_search(query)
+        if query.startswith("?"):
+            show_suggestions(query[1:].strip())
+            continue
+
+        query_text, filters = parse_query(query)
+        if not query_text:
+            print("Please enter search terms along with the filters.")
+            continue
+
+        results = perform_search(query_text, filters=filters)
         if results and 'hits' in results and len(results['hits']) > 0:
+            note = degraded_note(results)
+            if note:
+                print(note)
             filter_results(results['hits'])
         else:
             print("No results found or an error occurred.")
@@ -7,6 +7,7 @@ import config
 from bs4 import BeautifulSoup
 from cleantext import clean
 import pandas as pd
+from neardup import find_near_duplicates
 
 
 # Remove HTML tags using BeautifulSoup.
@@ -42,8 +43,53 @@ def clean_text(text):
                  )
 
 
+# Join several facet values into one CSV cell, dropping repeats and the placeholder when real values exist.
+def join_facet_values(values, default):
+    joined = []
+    for value in values:
+        for part in str(value).split(config.FACET_SEPARATOR):
+            if part and part not in joined:
+                joined.append(part)
+    if len(joined) > 1 and default in joined:
+        joined.remove(default)
+    return config.FACET_SEPARATOR.join(joined) if joined else default
+
+
+# Merge rows that share a URL (the same product scraped from several category pages) into one row
+# carrying all of their facet values.
+def merge_facet_values(df):
+    aggregations = {column: 'first' for column in df.columns if column != 'URL'}
+    for column, default in config.FACET_DEFAULTS.items():
+        aggregations[column] = lambda values, default=default: join_facet_values(values, default)
+    return df.groupby('URL', sort=False, as_index=False).agg(aggregations)[df.columns]
+
+
+# Collapse near-duplicate products into their first occurrence and save which URL each removed product maps to.
+def collapse_near_duplicates(df, threshold, mapping_file):
+    df = df.reset_index(drop=True)
+    texts = (df['Title'].astype(str) + " " + df['Description'].astype(str)).tolist()
+    canonical_ids = find_near_duplicates(texts, threshold,
+                                         num_perm=config.MINHASH_NUM_PERM,
+                                         shingle_size=config.SHINGLE_SIZE)
+
+    duplicate_rows = [row for row, canonical in enumerate(canonical_ids) if canonical != row]
+
+    # The canonical product inherits the facet values of its duplicates so filters still find it.
+    for column, default in config.FACET_DEFAULTS.items():
+        for row in duplicate_rows:
+            canonical = canonical_ids[row]
+            df.at[canonical, column] = join_facet_values([df.at[canonical, column], df.at[row, column]], default)
+    mapping = pd.DataFrame({
+        'URL': df.loc[duplicate_rows, 'URL'].tolist(),
+        'CanonicalURL': [df.at[canonical_ids[row], 'URL'] for row in duplicate_rows]
+    })
+    mapping.to_csv(mapping_file, index=False, encoding=config.CSV_ENCODING)
+    print(f"Collapsed {len(duplicate_rows)} near-duplicate products (mapping saved to {mapping_file}).")
+    return df.drop(index=duplicate_rows).reset_index(drop=True)
+
+
 # Preprocess the dataset by cleaning and standardizing the 'Title' and 'Description' columns.
-def preprocess_data(input_file, output_file):
+def preprocess_data(input_file, output_file, near_duplicate_threshold=config.NEAR_DUPLICATE_THRESHOLD):
     # Load the dataset from the raw CSV file.
     df = pd.read_csv(input_file, encoding=config.CSV_ENCODING)
 
@@ -51,16 +97,30 @@ def preprocess_data(input_file, output_file):
     df['Title'] = df['Title'].apply(clean_html)
     df['Description'] = df['Description'].apply(clean_html)
 
+    # Make sure every facet column exists so older scrapes can still be filtered on.
+    for column, default in config.FACET_DEFAULTS.items():
+        if column not in df.columns:
+            df[column] = default
+        else:
+            df[column] = df[column].fillna(default)
+
     # Replace missing values with a placeholder.
     df.fillna("Information Not Available", inplace=True)
 
-    # Remove duplicate rows.
-    df.drop_duplicates(inplace=True)
+    # Merge rows of the same product listed under several categories, then remove duplicate rows.
+    # Facet columns are left out of the comparison so differing facet values cannot keep duplicates apart.
+    df = merge_facet_values(df)
+    df.drop_duplicates(subset=[column for column in df.columns if column not in config.FACET_DEFAULTS],
+                       inplace=True)
 
     # Apply text cleaning to the 'Title' and 'Description' columns.
     df['Title'] = df['Title'].apply(clean_text)
     df['Description'] = df['Description'].apply(clean_text)
 
+    # Remove near-duplicate listings (whitespace, model-number suffix or boilerplate differences).
+    if near_duplicate_threshold is not None:
+        df = collapse_near_duplicates(df, near_duplicate_threshold, config.DUPLICATES_FILE)
+
     # Save the cleaned DataFrame to the cleaned CSV file.
     df.to_csv(output_file, index=False, encoding=config.CSV_ENCODING)
     return df
@@ -89,6 +149,7 @@ def run_preprocessing_pipeline():
         print(f"Title: {product['Title']}")
         print(f"Description: {product['Description']}")
         print(f"URL: {product['URL']}")
+        print(f"Category: {product['Category']}")
     else:
         print("The cleaned data is empty.")
 
@@ -3,9 +3,14 @@ import sys
 import json
 import logging
 import pandas as pd
+from typing import Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+from dotenv import load_dotenv
+
+# Load .env before config.py is imported (embedserver imports it) so EMBEDDING_SOCKET is picked up.
+load_dotenv()
+from embedserver import EmbeddingClient
 
 def setup_logging() -> None:
 
@@ -31,12 +36,14 @@ def generate_embeddings(
         model_name: str,
         device: str,
         batch_size: int,
-        show_progress_bar: bool
+        show_progress_bar: bool,
+        socket_path: Optional[str] = None
 ) -> np.ndarray:
 
     """
     Generate embeddings for combined text from the DataFrame using SentenceTransformer.
  it combines the 'Title' and 'Description' fields into 'combined_text' for the embedding model.
+ If socket_path is given, the shared embedding server is used instead of loading the model here.
     """
 
     if "Title" not in df.columns or "Description" not in df.columns:
@@ -46,8 +53,14 @@ def generate_embeddings(
     df["combined_text"] = df["Title"] + ". " + df["Description"]
     logging.info("Combined 'Title' and 'Description' into 'combined_text'.")
 
-    # Load the SentenceTransformer model using details from config.
-    model = SentenceTransformer(model_name, device=device)
+    # Use the embedding server when one is configured, otherwise load the model using details from config.
+    if socket_path:
+        model = EmbeddingClient(socket_path, timeout=None)
+        logging.info(f"Using embedding server at {socket_path}.")
+    else:
+        # Imported here so the embedding-server path never loads torch.
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device=device)
     logging.info("Generating embeddings...")
 
     # Encode the combined text.
@@ -139,7 +152,8 @@ def main():
         model_name=config.MODEL_NAME,
         device=config.DEVICE,
         batch_size=config.BATCH_SIZE,
-        show_progress_bar=config.SHOW_PROGRESS_BAR
+        show_progress_bar=config.SHOW_PROGRESS_BAR,
+        socket_path=config.EMBEDDING_SOCKET
     )
 
     #Compute the cosine similarity matrix (optional for future sorting or recommendations)
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import socket
+import stat
+import struct
+import time
+import logging
+import threading
+import socketserver
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from dotenv import load_dotenv
+
+# Insert the parent directory into sys.path so that config.py can be imported.
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+import config
+from hedging import remaining
+
+
+# Every message on the socket is a 4-byte big-endian length followed by a UTF-8 JSON body.
+HEADER = struct.Struct(">I")
+# Upper bound on a message body, so a bad length header cannot make the reader allocate gigabytes.
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+# Clients split larger inputs into several requests; the response to one request stays far below
+# MAX_MESSAGE_SIZE and no single client holds the server for a whole catalog.
+MAX_SENTENCES_PER_REQUEST = 512
+
+
+def _limit_to_deadline(sock: socket.socket, deadline: Optional[float]) -> None:
+    """
+    Give the next blocking socket call whatever is left of `deadline` (a time.monotonic() value),
+    so several calls together cannot overrun it. A zero timeout would switch the socket to
+    non-blocking mode, so an expired deadline raises TimeoutError instead.
+    """
+    if deadline is None:
+        return
+    time_left = remaining(deadline)
+    if time_left <= 0:
+        raise TimeoutError("Embedding request did not complete before its deadline.")
+    sock.settimeout(max(time_left, 0.001))
+
+
+def send_message(sock: socket.socket, payload: Dict[str, Any], deadline: Optional[float] = None) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    _limit_to_deadline(sock, deadline)
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def _recv_exactly(sock: socket.socket, size: int, deadline: Optional[float] = None) -> bytes:
+    chunks = []
+    while size > 0:
+        _limit_to_deadline(sock, deadline)
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Embedding socket closed before the message was complete.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket, deadline: Optional[float] = None) -> Dict[str, Any]:
+    (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size, deadline))
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Embedding message of {size} bytes exceeds the {MAX_MESSAGE_SIZE} byte limit.")
+    return json.loads(_recv_exactly(sock, size, deadline).decode("utf-8"))
+
+
+class EmbeddingClient:
+    """
+    Drop-in replacement for SentenceTransformer.encode that forwards the
+    sentences to a running embedding server over its Unix domain socket.
+    Only the options the server can honour are accepted; anything else raises TypeError
+    rather than silently returning embeddings that differ from the local model's.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def encode(
+            self,
+            sentences: Union[str, List[str]],
+            batch_size: int = 32,
+            show_progress_bar: bool = False,
+            normalize_embeddings: bool = False,
+            timeout: Optional[float] = None,
+            **kwargs: Any
+    ) -> np.ndarray:
+        if kwargs:
+            raise TypeError(f"EmbeddingClient.encode does not support: {', '.join(sorted(kwargs))}")
+        # show_progress_bar only affects the server's console, so it is accepted and ignored.
+        # batch_size only affects throughput: the server batches sentences across clients itself.
+        # timeout overrides the client's timeout for this call, e.g. to fit a search deadline.
+        # It bounds the whole call, not each socket operation; TimeoutError is raised past it.
+        # Mirror SentenceTransformer: a single string gives a 1-D vector, a list gives a matrix.
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        chunks = [
+            self._encode_chunk(texts[start:start + MAX_SENTENCES_PER_REQUEST], normalize_embeddings, deadline)
+            for start in range(0, len(texts), MAX_SENTENCES_PER_REQUEST)
+        ]
+        embeddings = np.concatenate(chunks) if chunks else np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def _encode_chunk(self, texts: List[str], normalize_embeddings: bool,
+                      deadline: Optional[float]) -> np.ndarray:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            _limit_to_deadline(sock, deadline)
+            sock.connect(self.socket_path)
+            send_message(sock, {"sentences": texts, "normalize_embeddings": normalize_embeddings}, deadline)
+            response = recv_message(sock, deadline)
+
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return np.array(response["embeddings"], dtype=np.float32)
+
+
+class EncodeJob:
+    """
+    One client's sentences waiting to be encoded, filled in batch by batch.
+    """
+
+    def __init__(self, sentences: List[str], normalize_embeddings: bool):
+        self.sentences = sentences
+        self.normalize_embeddings = normalize_embeddings
+        self.next_index = 0
+        self.chunks: List[np.ndarray] = []
+        self.embeddings: Optional[np.ndarray] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+    @property
+    def pending(self) -> int:
+        return len(self.sentences) - self.next_index
+
+
+class EmbeddingBatcher:
+    """
+    Owns the model and encodes the sentences of all connected clients on one thread,
+    `batch_size` sentences at a time. Each batch is filled with the jobs that have the
+    fewest sentences left first, so a search query waiting behind a bulk re-index is
+    encoded in the next batch instead of after the whole catalog, and concurrent small
+    requests are encoded together.
+    """
+
+    def __init__(self, model: Any, batch_size: int):
+        self.model = model
+        self.batch_size = batch_size
+        self._jobs: List[EncodeJob] = []
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def encode(self, sentences: List[str], normalize_embeddings: bool) -> np.ndarray:
+        if not sentences:
+            return np.empty((0, 0), dtype=np.float32)
+        job = EncodeJob(sentences, normalize_embeddings)
+        with self._condition:
+            self._jobs.append(job)
+            self._condition.notify()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.embeddings
+
+    def _next_batch(self) -> List[Tuple[EncodeJob, int, int]]:
+        with self._condition:
+            while not self._jobs:
+                self._condition.wait()
+            batch = []
+            capacity = self.batch_size
+            for job in sorted(self._jobs, key=lambda queued: queued.pending):
+                if capacity <= 0:
+                    break
+                count = min(job.pending, capacity)
+                batch.append((job, job.next_index, count))
+                job.next_index += count
+                capacity -= count
+            self._jobs = [job for job in self._jobs if job.pending > 0]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            sentences = [text for job, start, count in batch for text in job.sentences[start:start + count]]
+            try:
+                # Normalisation is applied per job below, so one batch can serve both kinds of request.
+                embeddings = np.asarray(self.model.encode(
+                    sentences,
+                    batch_size=self.batch_size,
+                    show_progress_bar=False
+                ), dtype=np.float32)
+            except Exception as e:
+                logging.error(f"Failed to encode a batch of {len(sentences)} sentences: {e}")
+                self._fail([job for job, _, _ in batch], e)
+                continue
+
+            offset = 0
+            for job, start, count in batch:
+                job.chunks.append(embeddings[offset:offset + count])
+                offset += count
+                if start + count == len(job.sentences):
+                    self._finish(job)
+
+    def _fail(self, jobs: List[EncodeJob], error: Exception) -> None:
+        with self._condition:
+            self._jobs = [job for job in self._jobs if job not in jobs]
+        for job in jobs:
+            job.error = error
+            job.done.set()
+
+    @staticmethod
+    def _finish(job: EncodeJob) -> None:
+        embeddings = np.concatenate(job.chunks)
+        if job.normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.maximum(norms, 1e-12)
+        job.embeddings = embeddings
+        job.done.set()
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        try:
+            request = recv_message(self.request)
+            sentences = request.get("sentences", [])
+            # Checked here so one bad request cannot fail the batch it would share with others.
+            if not isinstance(sentences, list) or not all(isinstance(text, str) for text in sentences):
+                raise ValueError("'sentences' must be a list of strings.")
+            if len(sentences) > MAX_SENTENCES_PER_REQUEST:
+                raise ValueError(f"At most {MAX_SENTENCES_PER_REQUEST} sentences can be sent per request.")
+            normalize_embeddings = bool(request.get("normalize_embeddings", False))
+            embeddings = self.server.batcher.encode(sentences, normalize_embeddings)
+            send_message(self.request, {"embeddings": embeddings.tolist()})
+        except ConnectionError:
+            # The client went away (or was only probing the socket), so there is nobody to answer.
+            logging.debug("Embedding client disconnected before the request completed.")
+        except Exception as e:
+            logging.error(f"Failed to serve embedding request: {e}")
+            try:
+                send_message(self.request, {"error": str(e)})
+            except OSError:
+                pass
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, model: Any, batch_size: int = config.BATCH_SIZE):
+        # Handler threads only queue work; the batcher is the one thread that uses the model.
+        self.batcher = EmbeddingBatcher(model, batch_size)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Remove a socket file left behind by a previous server, refusing to do so
+    if another server is still accepting connections on it or if the path is not a socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise RuntimeError(f"{socket_path} exists and is not a socket; refusing to remove it.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+            return
+    raise RuntimeError(f"An embedding server is already listening on {socket_path}")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    load_dotenv()
+    socket_path = os.getenv("EMBEDDING_SOCKET") or config.DEFAULT_EMBEDDING_SOCKET
+    model_name = os.getenv("MODEL_NAME", config.MODEL_NAME)
+
+    # Import lazily so clients of this module do not pay for loading torch.
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device=config.DEVICE)
+    logging.info(f"SentenceTransformer model '{model_name}' loaded.")
+
+    remove_stale_socket(socket_path)
+    with EmbeddingServer(socket_path, model) as server:
+        logging.info(f"Embedding server listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Shutting down embedding server.")
+        finally:
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main()
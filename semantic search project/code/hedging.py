@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Deque, Hashable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def remaining(deadline: float) -> float:
+    """
+    Seconds left until a time.monotonic() deadline, never negative.
+    """
+    return max(deadline - time.monotonic(), 0.0)
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies, used to decide when a request is late
+    enough that a duplicate should be sent to another replica.
+    """
+
+    def __init__(self, percentile: float = 0.95, window: int = 200,
+                 min_samples: int = 20, initial_threshold: float = 0.1):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_threshold = initial_threshold
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def threshold(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        # Until enough requests have been seen, fall back to a fixed delay
+        if len(samples) < self.min_samples:
+            return self.initial_threshold
+        return samples[min(int(len(samples) * self.percentile), len(samples) - 1)]
+
+
+class ThreadPerCallExecutor(Executor):
+    """
+    Executor that runs every call on its own daemon thread. Hedged requests must start
+    as soon as they are due; in a bounded pool they could queue behind earlier attempts
+    that lost their race and are still waiting on a slow node.
+    """
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        future: "Future[T]" = Future()
+
+        def run() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as error:
+                future.set_exception(error)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+
+def hedged_call(executor: Executor, attempts: List[Callable[[], T]],
+                hedge_after: float, deadline: float) -> T:
+    """
+    Run attempts[0], and whenever the attempts in flight have all failed or have been
+    running longer than `hedge_after` seconds, start the next one. The first attempt to
+    succeed wins; the others are left to finish in the background.
+    Raises TimeoutError if nothing succeeds before the deadline, or the last error
+    if every attempt failed.
+    """
+    pending: Set[Future] = set()
+    last_error: Optional[BaseException] = None
+    next_attempt = 0
+    hedge_at = 0.0
+    while True:
+        if next_attempt < len(attempts) and (not pending or time.monotonic() >= hedge_at):
+            pending.add(executor.submit(attempts[next_attempt]))
+            next_attempt += 1
+            hedge_at = time.monotonic() + hedge_after
+
+        if not pending:
+            raise last_error if last_error is not None else RuntimeError("No attempts to run.")
+        if remaining(deadline) <= 0:
+            raise TimeoutError("Deadline expired before any attempt completed.")
+
+        wait_for = remaining(deadline)
+        if next_attempt < len(attempts):
+            wait_for = min(wait_for, max(hedge_at - time.monotonic(), 0.0))
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            last_error = future.exception()
+
+
+class ResultCache:
+    """
+    Small thread-safe LRU of recent complete results, served when a query runs out of time.
+    Entries older than `max_age` seconds are dropped, so results from before a re-index
+    are not served indefinitely.
+    """
+
+    def __init__(self, max_entries: int = 256, max_age: float = 300.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            stored_at, value = self._entries[key]
+            if time.monotonic() - stored_at > self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -2,9 +2,11 @@ import sys
 import os
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import typesense
 from dotenv import load_dotenv
+from sharding import create_client, get_shard_key, load_shards, partition_records
+from suggest import build_prefix_index, save_prefix_index
 
 
 def setup_logging() -> None:
@@ -23,16 +25,17 @@ def load_environment_variables() -> str:
     return api_key
 
 
-def load_config() -> str:
+def load_config() -> Tuple[str, Dict[str, str], str, str]:
 
     config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     if config_dir not in sys.path:
         sys.path.append(config_dir)
     try:
-        from config import EMBEDDINGS_FILE
+        from config import EMBEDDINGS_FILE, FACET_DEFAULTS, FACET_SEPARATOR, SUGGESTIONS_FILE
     except ImportError as e:
-        raise ImportError("Could not import EMBEDDINGS_FILE from config.py") from e
-    return EMBEDDINGS_FILE
+        raise ImportError("Could not import EMBEDDINGS_FILE, FACET_DEFAULTS, FACET_SEPARATOR "
+                          "and SUGGESTIONS_FILE from config.py") from e
+    return EMBEDDINGS_FILE, FACET_DEFAULTS, FACET_SEPARATOR, SUGGESTIONS_FILE
 
 
 def load_product_embeddings(embeddings_file: str) -> List[Dict[str, Any]]:
@@ -60,6 +63,27 @@ def update_product_ids(product_records: List[Dict[str, Any]]) -> List[Dict[str,
     return product_records
 
 
+def ensure_facet_fields(product_records: List[Dict[str, Any]], facet_defaults: Dict[str, str],
+                        separator: str) -> List[Dict[str, Any]]:
+    """
+    Turn each facet field into the list of values the string[] schema field expects,
+    splitting values joined in the CSV and filling in missing ones, so every document
+    can be imported and matched by filter_by.
+
+    """
+    for product in product_records:
+        for field, default in facet_defaults.items():
+            value = product.get(field)
+            if isinstance(value, list):
+                values = [str(v) for v in value if v]
+            elif isinstance(value, str):
+                values = [v for v in value.split(separator) if v]
+            else:
+                values = []
+            product[field] = values or [default]
+    return product_records
+
+
 def save_updated_embeddings(product_records: List[Dict[str, Any]], original_file: str) -> str:
     """
     Save updated product records with unique IDs to a new JSON file.
@@ -76,23 +100,6 @@ def save_updated_embeddings(product_records: List[Dict[str, Any]], original_file
     return updated_file_path
 
 
-def initialize_typesense_client(api_key: str) -> typesense.Client:
-    """
-    Initialize and return a Typesense client using the provided API key.
-
-    """
-    client = typesense.Client({
-        'nodes': [{
-            'host': 'localhost',  # Your Typesense server's host
-            'port': '8108',  # Default Typesense port
-            'protocol': 'http'  # Use 'https' if applicable
-        }],
-        'api_key': api_key,
-        'connection_timeout_seconds': 5
-    })
-    return client
-
-
 def bulk_import_documents(client: typesense.Client, product_records: List[Dict[str, Any]],
                           collection_name: str = 'products') -> None:
     """
@@ -131,15 +138,26 @@ def main():
     logging.info("Starting product embeddings import process.")
     try:
         api_key = load_environment_variables()
-        embeddings_file = load_config()
+        embeddings_file, facet_defaults, facet_separator, suggestions_file = load_config()
         product_records = load_product_embeddings(embeddings_file)
         product_records = update_product_ids(product_records)
+        product_records = ensure_facet_fields(product_records, facet_defaults, facet_separator)
         updated_file_path = save_updated_embeddings(product_records, embeddings_file)
         logging.info(f"Updated embeddings file saved at: {updated_file_path}")
 
-        client = initialize_typesense_client(api_key)
-        bulk_import_documents(client, product_records)
-        get_collection_details(client)
+        # Build the title prefix index used by the CLI for suggestions without model inference
+        save_prefix_index(build_prefix_index(product_records), suggestions_file)
+        logging.info(f"Title suggestions index saved at: {suggestions_file}")
+
+        # Split the records across the shard collections (a single 'products' shard by default)
+        shards = load_shards(os.getenv("TYPESENSE_COLLECTION", "products"))
+        partitions = partition_records(product_records, len(shards), get_shard_key())
+        for shard, shard_records in zip(shards, partitions):
+            logging.info(f"Importing {len(shard_records)} documents into shard '{shard.collection}'.")
+            client = create_client(api_key, shard.nodes)
+            if shard_records:
+                bulk_import_documents(client, shard_records, shard.collection)
+            get_collection_details(client, shard.collection)
     except Exception as e:
         logging.error(f"Process terminated due to an error: {e}")
 
@@ -0,0 +1,122 @@
+import zlib
+from typing import Dict, List, Sequence, Set, Tuple
+import numpy as np
+from suggest import normalize_text
+
+
+# Universal hashing h(x) = (a * x + b) mod p over 32-bit shingle hashes, with a drawn
+# from [1, p) and b from [0, p) so each of the num_perm functions permutes the inputs
+# independently. a * x can reach 2**93, so it is computed modulo p in uint64 pieces.
+_MERSENNE_EXPONENT = 61
+_MERSENNE_PRIME = np.uint64((1 << _MERSENNE_EXPONENT) - 1)
+_LOW_32_BITS = np.uint64(0xFFFFFFFF)
+_LOW_29_BITS = np.uint64((1 << 29) - 1)
+
+
+def _reduce_mersenne(values: np.ndarray) -> np.ndarray:
+    """
+    Reduce values below 2**64 modulo 2**61 - 1, using 2**61 = 1 (mod p).
+    """
+    values = (values & _MERSENNE_PRIME) + (values >> np.uint64(_MERSENNE_EXPONENT))
+    return np.where(values >= _MERSENNE_PRIME, values - _MERSENNE_PRIME, values)
+
+
+def universal_hash(x: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Return (a * x + b) mod 2**61 - 1 for every pair of a column of 32-bit values `x`
+    and a row of coefficients `a`, `b` below the prime, without overflowing uint64.
+    """
+    x = x.reshape(-1, 1)
+    # Split a into 29 high and 32 low bits; each partial product then fits in 64 bits.
+    high = x * (a >> np.uint64(32))
+    low = x * (a & _LOW_32_BITS)
+    # high * 2**32 mod p: the bits that reach 2**61 and above wrap around to bit 0.
+    high = ((high & _LOW_29_BITS) << np.uint64(32)) | (high >> np.uint64(29))
+    product = _reduce_mersenne(high + _reduce_mersenne(low))
+    return _reduce_mersenne(product + b)
+
+
+def shingle(text: str, size: int) -> Set[int]:
+    """
+    Return the hashed character n-grams of the normalized text, so differences in
+    whitespace, letter variants or casing do not count against similarity.
+    """
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode("utf-8"))} if text else set()
+    return {zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)}
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int, shingle_size: int,
+                       seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute a MinHash signature for every text.
+    Returns the (len(texts), num_perm) signature matrix and a mask of texts that had any shingles.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(texts), num_perm), _MERSENNE_PRIME, dtype=np.uint64)
+    has_shingles = np.zeros(len(texts), dtype=bool)
+    for row, text in enumerate(texts):
+        hashes = shingle(text, shingle_size) if isinstance(text, str) else set()
+        if not hashes:
+            continue
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        signatures[row] = universal_hash(values, a, b).min(axis=0)
+        has_shingles[row] = True
+    return signatures, has_shingles
+
+
+def lsh_parameters(threshold: float, num_perm: int, min_recall: float = 0.95) -> Tuple[int, int]:
+    """
+    Choose the number of bands and rows per band. Two signatures with Jaccard similarity s
+    share at least one bucket with probability 1 - (1 - s**rows)**bands. Pick the most rows
+    per band (the fewest false candidates) for which a pair exactly at the threshold still
+    becomes a candidate with probability at least `min_recall`; more similar pairs are more
+    likely still. At 0.85 with 128 permutations this is 14 bands of 9 rows (about 97.5%).
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            best = (bands, rows)
+    return best
+
+
+def find_near_duplicates(texts: Sequence[str], threshold: float, num_perm: int = 128,
+                         shingle_size: int = 5) -> List[int]:
+    """
+    Return, for every text, the position of its canonical entry: an earlier text whose
+    estimated Jaccard similarity with it is at least `threshold`, or itself.
+    Every text is checked directly against its canonical entry, so groups never chain
+    (A~B and B~C does not pull C into A's group unless C~A as well).
+    Runs in time linear in the number of texts: each signature is hashed into one bucket
+    per band and only compared with the canonical entry of that bucket's first member.
+    Because of that, and because LSH banding itself is probabilistic (see lsh_parameters),
+    some pairs above the threshold can still be missed; those products are simply kept.
+    """
+    signatures, has_shingles = minhash_signatures(texts, num_perm, shingle_size)
+    bands, rows = lsh_parameters(threshold, num_perm)
+
+    canonical_ids = list(range(len(texts)))
+    # Entries that already have duplicates attached; they must stay canonical themselves.
+    has_duplicates: Set[int] = set()
+
+    for band in range(bands):
+        buckets: Dict[bytes, int] = {}
+        band_slice = slice(band * rows, (band + 1) * rows)
+        # Rows are visited in order, so every bucket's first member precedes the later ones.
+        for row in np.flatnonzero(has_shingles).tolist():
+            key = signatures[row, band_slice].tobytes()
+            first = buckets.setdefault(key, row)
+            canonical = canonical_ids[first]
+            if first == row or canonical_ids[row] != row or row in has_duplicates:
+                continue
+            similarity = np.mean(signatures[canonical] == signatures[row])
+            if similarity >= threshold:
+                canonical_ids[row] = canonical
+                has_duplicates.add(canonical)
+
+    return canonical_ids
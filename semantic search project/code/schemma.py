@@ -1,7 +1,7 @@
 import os
 import logging
-import typesense
 from dotenv import load_dotenv
+from sharding import create_client, load_shards
 
 # Setup logging configuration for better output control
 logging.basicConfig(
@@ -15,35 +15,28 @@ api_key = os.getenv('API_KEY')
 if not api_key:
     raise ValueError("API_KEY is not set in the environment variables.")
 
-# Initialize the Typesense client using the API key from the environment
-client = typesense.Client({
-    'nodes': [{
-        'host': 'localhost',   # Your Docker container is accessible here
-        'port': '8108',        # Default Typesense port
-        'protocol': 'http'
-    }],
-    'api_key': api_key,
-    'connection_timeout_seconds': 5
-})
+# One collection per shard (a single 'products' collection on localhost unless TYPESENSE_SHARDS is set)
+shards = load_shards(os.getenv("TYPESENSE_COLLECTION", "products"))
 
-logging.info("Typesense client initialized successfully.")
-
-# Define the collection schema
+# Define the collection schema; the name is filled in per shard
 schema = {
-    "name": "products",
     "fields": [
         {"name": "id", "type": "string"},
         {"name": "Title", "type": "string"},
         {"name": "Description", "type": "string"},
         {"name": "URL", "type": "string"},
         {"name": "combined_text", "type": "string"},
+        {"name": "Category", "type": "string[]", "facet": True},  # Filterable with filter_by; a product can be in several
         {"name": "embedding", "type": "float[]", "num_dim": 384}
     ]
 }
 
-# Attempt to create the collection; if it already exists, log the error
-try:
-    client.collections.create(schema)
-    logging.info("Collection 'products' created successfully.")
-except Exception as e:
-    logging.error(f"Collection creation failed or collection already exists: {e}")
+# Attempt to create each shard's collection; if it already exists, log the error
+for shard in shards:
+    # Initialize a Typesense client for the shard's nodes using the API key from the environment
+    client = create_client(api_key, shard.nodes)
+    try:
+        client.collections.create({**schema, "name": shard.collection})
+        logging.info(f"Collection '{shard.collection}' created successfully.")
+    except Exception as e:
+        logging.error(f"Collection '{shard.collection}' creation failed or collection already exists: {e}")
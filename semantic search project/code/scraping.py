@@ -48,6 +48,8 @@ def scrape_products():
 
     # Loop over category URLs to collect product URLs and append them to the list.
     for category_url in category_urls:
+        # The category slug (e.g. "cat-159") is kept with each product as a facet for filtered search.
+        category = category_url.rstrip("/").rsplit("/", 1)[-1]
         product_urls = []
         driver.get(category_url)
         # Keep collecting product URLs until we have 10 per category.
@@ -101,7 +103,7 @@ def scrape_products():
                 except NoSuchElementException:
                     description = "Description Not Found"
 
-                collected_products.append([title, description, url])
+                collected_products.append([title, description, url, category])
                 print(f"Collected product: {title}")
             except TimeoutException:
                 print(f"Timeout loading product page: {url}")
@@ -114,7 +116,7 @@ def scrape_products():
     if collected_products:
         with open(RAW_CSV_FILE, "w", newline="", encoding="utf-8") as file:
             writer = csv.writer(file)
-            writer.writerow(["Title", "Description", "URL"])
+            writer.writerow(["Title", "Description", "URL", "Category"])
             writer.writerows(collected_products)
         print(f"Successfully saved {len(collected_products)} products to {RAW_CSV_FILE}")
     else:
@@ -0,0 +1,93 @@
+import os
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional
+import typesense
+
+
+class Shard(NamedTuple):
+    collection: str
+    nodes: List[Dict[str, str]]
+
+
+def parse_node(address: str, protocol: str) -> Dict[str, str]:
+    host, _, port = address.partition(":")
+    return {'host': host, 'port': port or '8108', 'protocol': protocol}
+
+
+def load_shards(default_collection: str = 'products') -> List[Shard]:
+    """
+    Read the shard layout from TYPESENSE_SHARDS, a comma-separated list of
+    collection@host:port entries (e.g. "products_0@10.0.0.1:8108,products_1@10.0.0.2:8108").
+    Replica nodes of one shard's cluster can be listed with '|' (collection@host1:8108|host2:8108).
+    Without it there is a single shard on TYPESENSE_HOST:TYPESENSE_PORT.
+    """
+    protocol = os.getenv("TYPESENSE_PROTOCOL", "http")
+    default_node = f'{os.getenv("TYPESENSE_HOST", "localhost")}:{os.getenv("TYPESENSE_PORT", "8108")}'
+    layout = os.getenv("TYPESENSE_SHARDS", "").strip()
+    if not layout:
+        return [Shard(default_collection, [parse_node(default_node, protocol)])]
+
+    shards = []
+    for entry in layout.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        collection, _, addresses = entry.partition("@")
+        nodes = [parse_node(address.strip(), protocol) for address in (addresses or default_node).split("|")]
+        shards.append(Shard(collection.strip(), nodes))
+    if not shards:
+        raise ValueError("TYPESENSE_SHARDS does not define any shards.")
+    return shards
+
+
+def get_shard_key() -> str:
+    """
+    Return how documents are assigned to shards: 'hash' spreads them evenly by id,
+    'category' keeps each category together on one shard so category-filtered
+    searches only need to query the shards of the requested categories.
+    """
+    shard_key = os.getenv("TYPESENSE_SHARD_KEY", "hash").lower()
+    if shard_key not in ("hash", "category"):
+        raise ValueError("TYPESENSE_SHARD_KEY must be 'hash' or 'category'.")
+    return shard_key
+
+
+def shard_for(value: str, num_shards: int) -> int:
+    # crc32 rather than hash() so the assignment is stable across processes and runs
+    return zlib.crc32(value.encode("utf-8")) % num_shards
+
+
+def shards_for_categories(categories: List[str], num_shards: int) -> List[int]:
+    return sorted({shard_for(str(category), num_shards) for category in categories})
+
+
+def shards_for_product(product: Dict[str, Any], num_shards: int, shard_key: str) -> List[int]:
+    """
+    Return the shards a product is stored on. With the 'category' key a product listed
+    under several categories is stored on the shard of each of them, so a search filtered
+    on any one of its categories finds it; searches merge hits by id to drop the copies.
+    """
+    if shard_key == "category":
+        categories = product.get("Category") or [""]
+        if isinstance(categories, str):
+            categories = [categories]
+        return shards_for_categories(categories, num_shards)
+    return [shard_for(str(product["id"]), num_shards)]
+
+
+def partition_records(product_records: List[Dict[str, Any]], num_shards: int,
+                      shard_key: str) -> List[List[Dict[str, Any]]]:
+    partitions: List[List[Dict[str, Any]]] = [[] for _ in range(num_shards)]
+    for product in product_records:
+        for shard_index in shards_for_product(product, num_shards, shard_key):
+            partitions[shard_index].append(product)
+    return partitions
+
+
+def create_client(api_key: str, nodes: List[Dict[str, str]],
+                  connection_timeout: Optional[float] = 5) -> typesense.Client:
+    return typesense.Client({
+        'nodes': nodes,
+        'api_key': api_key,
+        'connection_timeout_seconds': connection_timeout
+    })
@@ -0,0 +1,111 @@
+import json
+import logging
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+
+# Arabic code points that Persian text commonly contains in place of their Persian forms,
+# plus Persian/Arabic-Indic digits, mapped to what users type on a Persian keyboard.
+_CHAR_MAP = str.maketrans({
+    "ي": "ی",  # Arabic yeh -> Persian yeh
+    "ى": "ی",  # Alef maksura -> Persian yeh
+    "ك": "ک",  # Arabic kaf -> Persian kaf
+    "ة": "ه",  # Teh marbuta -> heh
+    "أ": "ا",  # Alef with hamza above -> alef
+    "إ": "ا",  # Alef with hamza below -> alef
+    "ٱ": "ا",  # Alef wasla -> alef
+    "ؤ": "و",  # Waw with hamza -> waw
+    "\u200c": " ",  # Zero-width non-joiner separates words
+    "\u200d": "",  # Zero-width joiner
+    "\u0640": "",  # Tatweel
+    **{chr(0x06f0 + d): str(d) for d in range(10)},  # Persian digits
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic-Indic digits
+})
+# Harakat and other combining marks that do not change how a word is typed
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for prefix matching: unify Arabic/Persian letter variants and digits,
+    treat ZWNJ as a word break, drop diacritics, casefold and collapse whitespace.
+    """
+    text = _DIACRITICS.sub("", text.translate(_CHAR_MAP))
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+class PrefixIndex:
+    """
+    Sorted array of normalized title suffixes, one starting at each word of every title,
+    so a binary search finds all titles containing a word that starts with the typed prefix.
+    Titles are indexed both with ZWNJ as a word break and with ZWNJ removed, so "ماشین‌ها",
+    "ماشین ها" and "ماشینها" all find the same titles.
+    """
+
+    def __init__(self, titles: Sequence[str], entries: Optional[List[List[Any]]] = None):
+        self.titles = list(titles)
+        if entries is None:
+            unique_entries = set()
+            for title_id, title in enumerate(self.titles):
+                for form in (title, title.replace("\u200c", "")):
+                    words = normalize_text(form).split(" ")
+                    for start in range(len(words)):
+                        unique_entries.add((" ".join(words[start:]), title_id))
+            entries = [[key, title_id] for key, title_id in sorted(unique_entries)]
+        self._keys = [key for key, _ in entries]
+        self._title_ids = [title_id for _, title_id in entries]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Return up to `limit` distinct titles containing a word sequence that starts with `prefix`.
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        suggestions = []
+        seen = set()
+        position = bisect_left(self._keys, prefix)
+        while position < len(self._keys) and self._keys[position].startswith(prefix):
+            title_id = self._title_ids[position]
+            if title_id not in seen:
+                seen.add(title_id)
+                suggestions.append(self.titles[title_id])
+                if len(suggestions) >= limit:
+                    break
+            position += 1
+        return suggestions
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "titles": self.titles,
+            "entries": [[key, title_id] for key, title_id in zip(self._keys, self._title_ids)]
+        }
+
+
+def build_prefix_index(product_records: List[Dict[str, Any]]) -> PrefixIndex:
+    """
+    Build a prefix index from the distinct, non-empty product titles.
+    """
+    titles = list(dict.fromkeys(
+        product["Title"] for product in product_records
+        if isinstance(product.get("Title"), str) and product["Title"].strip()
+    ))
+    return PrefixIndex(titles)
+
+
+def save_prefix_index(index: PrefixIndex, output_file: str) -> None:
+    try:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False)
+    except IOError as e:
+        logging.error(f"Error writing suggestions file: {output_file}")
+        raise e
+
+
+def load_prefix_index(input_file: str) -> PrefixIndex:
+    # The entries are stored already sorted, so loading does not need to rebuild the index.
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return PrefixIndex(data["titles"], data["entries"])
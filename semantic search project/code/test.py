@@ -1,5 +1,5 @@
 import logging
-from CLI import perform_search, filter_results  # Ensure 'CLI' is the correct module name
+from CLI import parse_query, perform_search, filter_results, degraded_note  # Ensure 'CLI' is the correct module name
 
 # Disable all logging messages
 logging.disable(logging.CRITICAL)
@@ -15,8 +15,16 @@ def interactive_test():
             print("Empty query. Please try again.")
             continue
 
-        results = perform_search(query)
+        query_text, filters = parse_query(query)
+        if not query_text:
+            print("Filters need search terms too. Please try again.")
+            continue
+
+        results = perform_search(query_text, filters=filters)
         if results and 'hits' in results and len(results['hits']) > 0:
+            note = degraded_note(results)
+            if note:
+                print(note)
             print("\nRetrieved Results:")
             filter_results(results['hits'])
         else:
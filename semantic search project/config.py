@@ -12,11 +12,30 @@ os.makedirs(DATA_DIR, exist_ok=True)
 RAW_CSV_FILE = os.path.join(DATA_DIR, "products_data.csv")
 CLEANED_CSV_FILE = os.path.join(DATA_DIR, "cleaned_products_data.csv")
 EMBEDDINGS_FILE = os.path.join(DATA_DIR, "product_embeddings.json")
+SUGGESTIONS_FILE = os.path.join(DATA_DIR, "title_suggestions.json")
+DUPLICATES_FILE = os.path.join(DATA_DIR, "near_duplicate_products.csv")
 
 # Model configuration
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 DEVICE = "cpu"
 
+# Unix domain socket of the shared embedding server (embedserver.py).
+# When EMBEDDING_SOCKET is set, embeddings are requested from the server instead of loading the model locally.
+DEFAULT_EMBEDDING_SOCKET = "/tmp/jooyeshgar-embeddings.sock"
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET")
+
+# Structured attributes carried through the pipeline as Typesense facet fields, with the
+# value used for records scraped before the attribute existed. A product can have several
+# values (e.g. listed under two categories); CSV files join them with FACET_SEPARATOR.
+FACET_DEFAULTS = {"Category": "uncategorized"}
+FACET_SEPARATOR = "|"
+
+# Near-duplicate detection (MinHash/LSH) in dataprep.py. Products whose Title + Description
+# have an estimated Jaccard similarity at or above the threshold are collapsed; None disables it.
+NEAR_DUPLICATE_THRESHOLD = 0.85
+MINHASH_NUM_PERM = 128
+SHINGLE_SIZE = 5
+
 # Encoding settings
 CSV_ENCODING = "utf-8"
 
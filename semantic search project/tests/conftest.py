@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules under code/ import each other by bare name, as they do when run as scripts.
+code_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'code'))
+if code_dir not in sys.path:
+    sys.path.insert(0, code_dir)
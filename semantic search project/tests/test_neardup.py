@@ -0,0 +1,68 @@
+import random
+import string
+import numpy as np
+from neardup import _MERSENNE_PRIME, find_near_duplicates, minhash_signatures, shingle, universal_hash
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+
+
+def random_text(rng: random.Random, length: int = 200, alphabet: str = string.ascii_lowercase) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def jaccard(first: str, second: str) -> float:
+    a, b = shingle(first, SHINGLE_SIZE), shingle(second, SHINGLE_SIZE)
+    return len(a & b) / len(a | b)
+
+
+def estimated_similarity(first: str, second: str) -> float:
+    signatures, _ = minhash_signatures([first, second], NUM_PERM, SHINGLE_SIZE)
+    return float(np.mean(signatures[0] == signatures[1]))
+
+
+def test_universal_hash_matches_exact_arithmetic():
+    prime = int(_MERSENNE_PRIME)
+    rng = np.random.default_rng(0)
+    a = np.append(rng.integers(1, _MERSENNE_PRIME, size=63, dtype=np.uint64), np.uint64(prime - 1))
+    b = np.append(rng.integers(0, _MERSENNE_PRIME, size=63, dtype=np.uint64), np.uint64(prime - 1))
+    x = np.append(rng.integers(0, 1 << 32, size=200, dtype=np.uint64), np.uint64((1 << 32) - 1))
+
+    expected = [[(int(ai) * int(xi) + int(bi)) % prime for ai, bi in zip(a, b)] for xi in x]
+    assert universal_hash(x, a, b).tolist() == expected
+
+
+def test_estimate_tracks_jaccard_for_unrelated_texts():
+    # A small alphabet makes unrelated texts share a few shingles, like listings sharing
+    # boilerplate; those must not make their signatures agree.
+    rng = random.Random(0)
+    texts = [random_text(rng, alphabet="abcdefgh") for _ in range(100)]
+    signatures, _ = minhash_signatures(texts, NUM_PERM, SHINGLE_SIZE)
+    for i in range(len(texts)):
+        for j in range(i + 1, len(texts)):
+            assert jaccard(texts[i], texts[j]) < 0.05
+            assert np.mean(signatures[i] == signatures[j]) < 0.2
+
+
+def test_estimate_tracks_jaccard_for_near_identical_texts():
+    rng = random.Random(1)
+    for _ in range(20):
+        text = random_text(rng, 400)
+        position = rng.randrange(len(text))
+        edited = text[:position] + "-" + text[position + 1:]
+        assert jaccard(text, edited) > 0.95
+        assert abs(estimated_similarity(text, edited) - jaccard(text, edited)) < 0.1
+
+
+def test_unrelated_texts_are_not_collapsed():
+    rng = random.Random(2)
+    texts = [random_text(rng, alphabet="abcdefgh") for _ in range(2000)]
+    assert find_near_duplicates(texts, threshold=0.85) == list(range(len(texts)))
+
+
+def test_near_identical_texts_are_collapsed():
+    rng = random.Random(3)
+    text = random_text(rng, 400)
+    unrelated = random_text(rng, 400)
+    texts = [text, unrelated, text[:-1] + "-"]
+    assert find_near_duplicates(texts, threshold=0.85) == [0, 1, 0]